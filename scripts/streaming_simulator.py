@@ -0,0 +1,1081 @@
+#!/usr/bin/env python3
+"""Streaming simulator for the Dinsight API.
+
+Uploads a baseline CSV, waits for DInsight processing to finish, then
+replays a monitoring CSV against `/monitor/{id}` in timed batches so the
+live monitor page has something to render. Designed for demos and for
+load-testing the streaming ingest path without physical sensors.
+
+Usage:
+    python scripts/streaming_simulator.py \
+        --baseline test-data/test-baseline.csv \
+        --monitor test-data/test-monitoring.csv \
+        --batch-size 1 --delay 2.0
+
+Defaults target a local dev stack (backend on :8080, seed admin login).
+"""
+
+import argparse
+import asyncio
+import atexit
+import csv
+import functools
+import gzip
+import io
+import itertools
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+try:  # optional: compact float64 storage + vectorized numeric work
+    import numpy as np
+except ImportError:
+    np = None
+
+try:  # optional: C-parser fast path for wide CSVs
+    import pandas as pd
+except ImportError:
+    pd = None
+
+try:  # optional: 2-3x faster JSON on float-heavy coordinate payloads
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # optional: binary Arrow IPC wire format (--wire-format arrow)
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_API_URL = 'http://localhost:8080/api/v1'
+DEFAULT_EMAIL = 'admin@disum.com'
+DEFAULT_PASSWORD = 'DInsight123!'
+
+# Compiled once at import — these run against every header of every file.
+_FREQ_RE = re.compile(r'freq_\d+\.\d{2,}')
+_F_RE = re.compile(r'\bf_\d+\b')
+_FEATURE_PREFIXES = ('f_', 'freq_')
+
+
+class HeaderInfo(NamedTuple):
+    """Everything we derive from a CSV header row, computed in one pass."""
+
+    family: str
+    normalized: List[str]
+    feature_columns: List[str]
+
+
+def _analyze_headers(headers: List[str]) -> HeaderInfo:
+    """Normalize, classify, and feature-scan a header row (memoized)."""
+    return _analyze_headers_cached(tuple(headers))
+
+
+@functools.lru_cache(maxsize=32)
+def _analyze_headers_cached(headers: Tuple[str, ...]) -> HeaderInfo:
+    """Normalize, classify, and feature-scan the headers in a single walk.
+
+    Fuses what used to be three separate O(cols) passes (normalize /
+    detect family / extract features) into one loop with one lowercase
+    per header. Memoized on the header tuple: replaying the same file —
+    or streaming several files that share a schema — re-analyzes a
+    2000-column header exactly once per process.
+    """
+    normalized: List[str] = []
+    feature_columns: List[str] = []
+    has_freq = has_f = False
+    # Loop-invariant bindings: skip the attribute/global lookups per header
+    # (thousands of iterations for wide freq_* files).
+    normalized_append = normalized.append
+    feature_append = feature_columns.append
+    prefixes = _FEATURE_PREFIXES
+    for header in headers:
+        cleaned = header.strip()
+        if cleaned.startswith('﻿'):
+            cleaned = cleaned[1:]
+        lower = cleaned.lower()
+        if lower.startswith(prefixes):
+            feature_append(cleaned)
+            if not has_freq and _FREQ_RE.match(lower):
+                has_freq = True
+            elif not has_f and _F_RE.match(lower):
+                has_f = True
+        normalized_append(cleaned)
+    family = 'store-d' if has_freq else 'segment' if has_f else 'unknown'
+    return HeaderInfo(family, normalized, feature_columns)
+
+
+async def _read_json(response: aiohttp.ClientResponse):
+    """Decode a JSON response body, via orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(await response.read())
+    return await response.json()
+
+
+# Log records are handed to a background thread via a queue so that file
+# and console writes never block the event loop mid-stream.
+_log_queue: 'queue.Queue' = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler('streaming_simulator.log'),
+    logging.StreamHandler(),
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s %(message)s',
+    handlers=[QueueHandler(_log_queue)],
+)
+logger = logging.getLogger('streaming_simulator')
+
+
+class StreamingSimulator:
+    """Drives a baseline upload + monitor replay against the Dinsight API."""
+
+    def __init__(
+        self,
+        api_url: str = DEFAULT_API_URL,
+        email: str = DEFAULT_EMAIL,
+        password: str = DEFAULT_PASSWORD,
+        org_id: Optional[int] = None,
+        max_inflight: int = 4,
+        debug_dumps: bool = False,
+        strict_validate: bool = False,
+        compress: bool = False,
+        adaptive_batch: bool = False,
+        max_batch_wait: float = 1.0,
+        max_batch_size: int = 32,
+        validate_each_batch: bool = False,
+        wire_format: str = 'csv',
+        feature_max_freq: Optional[float] = None,
+        feature_max_index: Optional[int] = None,
+        fetch_baseline_info: bool = False,
+        log_every: int = 50,
+    ):
+        self.api_url = api_url.rstrip('/')
+        self.email = email
+        self.password = password
+        self.org_id = org_id
+        # Upload pipelining depth; 1 restores strict one-at-a-time ordering.
+        self.max_inflight = max(1, max_inflight)
+        self.debug_dumps = debug_dumps
+        self.strict_validate = strict_validate
+        # Opt-in: requires a backend that understands Content-Encoding: gzip.
+        self.compress = compress
+        self.adaptive_batch = adaptive_batch
+        self.max_batch_wait = max_batch_wait
+        self.max_batch_size = max(1, max_batch_size)
+        self.validate_each_batch = validate_each_batch
+        # Optional column projection for very wide spectra: features above
+        # the cap are dropped once at load, not re-filtered per batch.
+        self.feature_max_freq = feature_max_freq
+        self.feature_max_index = feature_max_index
+        # Baseline coordinates are only fetched for the startup log line;
+        # opt-in, since the download+parse scales with baseline size.
+        self.fetch_baseline_info = fetch_baseline_info
+        # INFO progress cadence; per-batch detail stays at DEBUG.
+        self.log_every = max(1, log_every)
+        # Binary batches skip %g text round-trips but need a backend that
+        # speaks Arrow IPC — csv stays the default until it does.
+        if wire_format == 'arrow' and pa is None:
+            logger.warning('pyarrow not installed — falling back to csv wire format')
+            wire_format = 'csv'
+        self.wire_format = wire_format
+        self._batch_content_type = (
+            'application/vnd.apache.arrow.stream'
+            if wire_format == 'arrow' else 'text/csv'
+        )
+        self._batch_suffix = 'arrow' if wire_format == 'arrow' else 'csv'
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.headers: Dict[str, str] = {}
+        self.monitor_file_path: Optional[str] = None
+        self.total_rows: int = 0
+        self.expected_vector_length: int = 0
+        self._feature_columns: List[str] = []
+        self._feature_col_set: frozenset = frozenset()
+        self._fieldnames_no_index: List[str] = []
+        self._header_bytes: bytes = b''
+        self._feature_flags: List[bool] = []
+        self._feature_idx: List[int] = []
+        self._meta_idx: List[int] = []
+        self._keep_idx: Optional[List[int]] = None
+        self._needs_quoting: bool = True
+        self.baseline_coordinates: Optional[Tuple] = None  # (x, y) ndarrays or lists
+        self.stream_progress: int = 0
+        self._head_count_supported: Optional[bool] = None
+        # One boundary for the whole run: every batch POST shares the same
+        # Content-Type header string instead of minting a fresh boundary.
+        self._mp_boundary = uuid.uuid4().hex
+
+    async def __aenter__(self) -> 'StreamingSimulator':
+        # One long-lived session for the whole run: keep-alive sockets are
+        # reused across thousands of batch POSTs instead of re-handshaking.
+        connector = aiohttp.TCPConnector(
+            limit=self.max_inflight,
+            limit_per_host=self.max_inflight,
+            keepalive_timeout=75,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=None, connect=10, sock_read=30)
+        session_kwargs = {}
+        if orjson is not None:
+            # Covers the remaining json= call sites (e.g. login).
+            session_kwargs['json_serialize'] = lambda obj: orjson.dumps(obj).decode()
+        self.session = aiohttp.ClientSession(
+            connector=connector, timeout=timeout, **session_kwargs
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    # ------------------------------------------------------------------
+    # Auth
+    # ------------------------------------------------------------------
+
+    async def authenticate(self) -> None:
+        """Log in and stamp Authorization (+ X-Org-ID) on future requests."""
+        async with self.session.post(
+            f'{self.api_url}/auth/login',
+            json={'email': self.email, 'password': self.password},
+        ) as response:
+            if response.status != 200:
+                body = await response.text()
+                raise RuntimeError(f'Login failed ({response.status}): {body}')
+            result = await _read_json(response)
+        token = result['data']['access_token']
+        self.headers = {'Authorization': f'Bearer {token}'}
+        if self.org_id is not None:
+            self.headers['X-Org-ID'] = str(self.org_id)
+        logger.info('🔐 Authenticated as %s', self.email)
+
+    # ------------------------------------------------------------------
+    # CSV schema handling
+    # ------------------------------------------------------------------
+
+    # Thin wrappers over the fused single-pass analyzer, kept for callers
+    # that only need one facet of the header row.
+
+    def normalize_headers(self, headers: List[str]) -> List[str]:
+        """Strip BOM + surrounding whitespace from raw CSV header names."""
+        return _analyze_headers(headers).normalized
+
+    def detect_dataset_family(self, headers: List[str]) -> str:
+        """Classify the CSV by its feature-column naming convention.
+
+        'store-d' files carry wide `freq_X.XX` spectra; 'segment' files the
+        compact `f_N` vectors used by the bundled test-data.
+        """
+        return _analyze_headers(headers).family
+
+    def extract_feature_columns(self, headers: List[str]) -> List[str]:
+        """Return the subset of headers holding numeric feature values."""
+        return _analyze_headers(headers).feature_columns
+
+    def _validate_length_only(self, row: Tuple[str, ...]) -> None:
+        """Cheap check that a row has a cell for every expected column."""
+        if len(row) != len(self._fieldnames_no_index):
+            raise ValueError(
+                f'Row has {len(row)} cells, expected {len(self._fieldnames_no_index)}'
+            )
+
+    def _validate_numeric(self, row: Tuple[str, ...]) -> None:
+        """Full check that every feature cell parses as a number."""
+        try:
+            for i in self._feature_idx:
+                float(row[i])  # raises ValueError on junk cells
+        except IndexError:
+            raise ValueError(
+                f'Row has {len(row)} cells, expected {len(self._fieldnames_no_index)}'
+            ) from None
+
+    def _keep_column(self, name: str) -> bool:
+        """Apply the --feature-max-freq/--feature-max-index caps to one header."""
+        lower = name.lower()
+        if lower.startswith('freq_') and self.feature_max_freq is not None:
+            try:
+                return float(lower[5:]) <= self.feature_max_freq
+            except ValueError:
+                return True
+        if lower.startswith('f_') and self.feature_max_index is not None:
+            try:
+                return int(lower[2:]) <= self.feature_max_index
+            except ValueError:
+                return True
+        return True
+
+    def _prepare_schema(self, info: HeaderInfo, path: str) -> str:
+        """Cache the analyzed schema so the hot path never re-derives it."""
+        if not info.feature_columns:
+            raise ValueError(f'No feature columns (f_*/freq_*) found in {path}')
+        if self.feature_max_freq is not None or self.feature_max_index is not None:
+            keep_idx = [
+                i for i, name in enumerate(info.normalized)
+                if self._keep_column(name)
+            ]
+            if len(keep_idx) != len(info.normalized):
+                feature_set = set(info.feature_columns)
+                normalized = [info.normalized[i] for i in keep_idx]
+                info = HeaderInfo(
+                    info.family,
+                    normalized,
+                    [name for name in normalized if name in feature_set],
+                )
+                # Rows are projected to this mask once, as they are read.
+                self._keep_idx = keep_idx
+                if not info.feature_columns:
+                    raise ValueError(
+                        f'Feature caps removed every feature column in {path}'
+                    )
+        self.expected_vector_length = len(info.feature_columns)
+        self._feature_columns = info.feature_columns
+        self._feature_col_set = frozenset(info.feature_columns)
+        self._fieldnames_no_index = list(info.normalized)
+        self._feature_flags = [
+            c in self._feature_col_set for c in self._fieldnames_no_index
+        ]
+        # Column positions of the feature cells — rows travel as positional
+        # tuples, so all hot-path access is by index, never by key.
+        self._feature_idx = [
+            i for i, is_feature in enumerate(self._feature_flags) if is_feature
+        ]
+        self._meta_idx = [
+            i for i, is_feature in enumerate(self._feature_flags) if not is_feature
+        ]
+        # Clean header names unlock the join-based serializer fast path.
+        self._needs_quoting = any(
+            ',' in c or '"' in c or '\n' in c or '\r' in c
+            for c in self._fieldnames_no_index
+        )
+        # The header line is identical for every batch — serialize and
+        # encode it once; batches prepend the cached bytes.
+        header_buf = io.StringIO()
+        csv.writer(header_buf).writerow(self._fieldnames_no_index)
+        self._header_bytes = header_buf.getvalue().encode('utf-8')
+        return info.family
+
+    def load_monitor_data(self, monitor_file_path: str) -> None:
+        """Analyze the monitor CSV's schema and count its rows.
+
+        Deliberately does NOT materialize the file: rows are streamed
+        lazily by iter_monitor_rows, so peak memory stays O(batch_size)
+        no matter how large the monitor file is. Only the header, the
+        first data row (numeric sanity check), and a cheap row count are
+        read here.
+        """
+        # No exists() pre-check: open() stats the path anyway, so let it
+        # raise and just rephrase the error.
+        try:
+            with open(monitor_file_path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                original_headers = next(reader, [])
+                info = _analyze_headers(original_headers)
+                family = self._prepare_schema(info, monitor_file_path)
+
+                total_rows = 0
+                # Blank lines (e.g. a trailing newline) are not rows: skip
+                # them here and in the iterator so the count matches what
+                # is actually streamed.
+                first = next((r for r in reader if r), None)
+                if first is not None:
+                    keep = self._keep_idx
+                    first_row = tuple(first[i] for i in keep) if keep else tuple(first)
+                    self._validate_length_only(first_row)
+                    self._validate_numeric(first_row)
+                    total_rows = 1 + sum(1 for r in reader if r)
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f'Monitor file not found: {monitor_file_path}'
+            ) from None
+
+        self.monitor_file_path = monitor_file_path
+        self.total_rows = total_rows
+
+        logger.info(
+            '📄 Monitor file has %d rows (%s family, %d features)',
+            self.total_rows, family, self.expected_vector_length,
+        )
+
+    def iter_monitor_rows(self, monitor_file_path: Optional[str] = None) -> Iterator[Tuple[str, ...]]:
+        """Yield monitor rows lazily as positional tuples.
+
+        Rows stay in header order end to end: no per-row dict is ever
+        built, and downstream code addresses cells via the cached
+        `_feature_idx`/`_feature_flags` arrays. Uses pandas' C parser in
+        chunks when installed, else the stdlib reader; either way only one
+        chunk/row is resident at a time. With --strict every yielded row
+        is numerically validated.
+        """
+        path = monitor_file_path or self.monitor_file_path
+        strict = self.strict_validate
+        keep = self._keep_idx
+        if pd is not None:
+            # usecols makes the C parser skip dropped columns outright.
+            frames = pd.read_csv(
+                path, dtype=str, keep_default_na=False,
+                encoding='utf-8-sig', chunksize=4096, usecols=keep,
+            )
+            for frame in frames:
+                for row in frame.itertuples(index=False, name=None):
+                    if strict:
+                        self._validate_numeric(row)
+                    yield row
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # header
+                if keep is None:
+                    for raw in reader:
+                        if not raw:  # blank line — DictReader used to skip these
+                            continue
+                        row = tuple(raw)
+                        if strict:
+                            self._validate_numeric(row)
+                        yield row
+                else:
+                    for raw in reader:
+                        if not raw:
+                            continue
+                        row = tuple(raw[i] for i in keep)
+                        if strict:
+                            self._validate_numeric(row)
+                        yield row
+
+    # ------------------------------------------------------------------
+    # Baseline upload + processing
+    # ------------------------------------------------------------------
+
+    async def upload_baseline_file(self, baseline_file_path: str) -> Optional[int]:
+        """Upload the baseline CSV and wait for DInsight processing.
+
+        Returns the dinsight data id once coordinates are available, or
+        None if processing did not finish within the polling budget.
+        """
+        # Hand aiohttp the open handle so it streams the multipart body:
+        # peak memory stays constant and TCP send overlaps the disk read.
+        # (No exists() pre-check — open() already pays that stat.)
+        try:
+            f = await asyncio.to_thread(open, baseline_file_path, 'rb')
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f'Baseline file not found: {baseline_file_path}'
+            ) from None
+        try:
+            data = aiohttp.FormData()
+            data.add_field(
+                'files',
+                f,
+                filename=os.path.basename(baseline_file_path),
+                content_type='text/csv',
+            )
+
+            logger.info('⬆️  Uploading baseline %s ...', baseline_file_path)
+            async with self.session.post(
+                f'{self.api_url}/analyze', data=data, headers=self.headers
+            ) as response:
+                if response.status != 200:
+                    body = await response.text()
+                    logger.error('Baseline upload failed (%s): %s', response.status, body)
+                    return None
+                result = await _read_json(response)
+        finally:
+            f.close()
+
+        dinsight_id = result['data']['id']
+        logger.info('✅ Baseline accepted, dinsight id %s — waiting for processing', dinsight_id)
+        if await self._poll_for_processing_completion(dinsight_id):
+            return dinsight_id
+        return None
+
+    async def _poll_for_processing_completion(self, dinsight_id: int) -> bool:
+        """Poll `/dinsight/{id}` until coordinates exist (processing done)."""
+        # Wall-clock budget instead of a fixed attempt count: fast polls
+        # early on don't eat into the time a slow backend actually gets.
+        poll_budget = 120.0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + poll_budget
+        attempt = 0
+        while loop.time() < deadline:
+            attempt += 1
+            retry_after = None
+            try:
+                async with self.session.get(
+                    f'{self.api_url}/dinsight/{dinsight_id}', headers=self.headers
+                ) as response:
+                    retry_after = response.headers.get('Retry-After')
+                    if response.status == 200:
+                        result = await _read_json(response)
+                        coords = result.get('data', {}).get('dinsight_x') or []
+                        if coords:
+                            logger.info(
+                                '🏁 Processing complete after %d polls (%d points)',
+                                attempt, len(coords),
+                            )
+                            return True
+            except aiohttp.ClientError as exc:
+                # Connection churn while the backend is busy is expected;
+                # anything else (KeyError, cancellation, ...) should surface.
+                logger.debug('Poll %d transient error: %s', attempt, exc)
+            delay = None
+            if retry_after is not None:
+                # The server told us exactly how long to wait.
+                try:
+                    delay = max(0.0, float(retry_after))
+                except ValueError:
+                    delay = None
+            if delay is None:
+                # Exponential backoff: burst of fast polls, then settle at
+                # 4s. Jitter keeps several simulators from polling in
+                # lockstep against the same backend.
+                delay = min(4.0, 0.25 * 2 ** min(attempt - 1, 4))
+                delay += random.uniform(0.0, 0.05)
+            await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+        logger.error('Processing did not complete within %.0fs', poll_budget)
+        return False
+
+    async def load_baseline_coordinates(self, dinsight_id: int) -> Tuple:
+        """Fetch the processed baseline scatter coordinates.
+
+        Stored as contiguous float64 ndarrays when numpy is available
+        (~3.5x smaller than lists of Python floats, and ready for any
+        vectorized distance work); plain lists otherwise.
+        """
+        async with self.session.get(
+            f'{self.api_url}/dinsight/{dinsight_id}', headers=self.headers
+        ) as response:
+            response.raise_for_status()
+            result = await _read_json(response)
+        payload = result['data']
+        dinsight_x = payload.get('dinsight_x', [])
+        dinsight_y = payload.get('dinsight_y', [])
+        if np is not None:
+            dinsight_x = np.asarray(dinsight_x, dtype=np.float64)
+            dinsight_y = np.asarray(dinsight_y, dtype=np.float64)
+        self.baseline_coordinates = (dinsight_x, dinsight_y)
+        return self.baseline_coordinates
+
+    async def _update_streaming_config(self, batch_size: int, delay_seconds: float) -> None:
+        """Record the simulated stream's cadence in the backend config."""
+        config_data = {
+            'streaming_source': 'simulator',
+            'streaming_batch_size': batch_size,
+            'streaming_delay_seconds': delay_seconds,
+        }
+        if orjson is not None:
+            body_kwargs = {
+                'data': orjson.dumps(config_data),
+                'headers': {**self.headers, 'Content-Type': 'application/json'},
+            }
+        else:
+            body_kwargs = {'json': config_data, 'headers': self.headers}
+        async with self.session.post(
+            f'{self.api_url}/config', **body_kwargs
+        ) as response:
+            if response.status not in (200, 201):
+                logger.warning('Config update returned %s (continuing)', response.status)
+
+    # ------------------------------------------------------------------
+    # Monitor streaming
+    # ------------------------------------------------------------------
+
+    async def _fetch_server_point_count(self, baseline_id: int) -> int:
+        """Get the server-side point count as cheaply as the API allows.
+
+        Tries a HEAD with an X-Coordinate-Count header first (O(1) on the
+        wire); the backend lives out of this tree, so when it doesn't
+        answer with the header we remember that and fall back to the full
+        coordinate GET.
+        """
+        url = f'{self.api_url}/monitor/{baseline_id}/coordinates'
+        if self._head_count_supported is not False:
+            try:
+                async with self.session.head(url, headers=self.headers) as response:
+                    count = response.headers.get('X-Coordinate-Count')
+                    if count is not None:
+                        self._head_count_supported = True
+                        return int(count)
+            except aiohttp.ClientError:
+                pass
+            self._head_count_supported = False
+        async with self.session.get(url, headers=self.headers) as response:
+            response.raise_for_status()
+            result = await _read_json(response)
+        return len(result.get('data', {}).get('dinsight_x') or [])
+
+    async def get_streaming_status(
+        self, baseline_id: int, refresh_remote: bool = False
+    ) -> Dict[str, object]:
+        """Report stream progress from counters the simulator already keeps.
+
+        The default answers in microseconds with no I/O, so frequent
+        status polls never compete with the POST pipeline for the bounded
+        connection pool. Pass refresh_remote=True for an occasional full
+        sync against the server's point count (None otherwise).
+        """
+        server_points = None
+        if refresh_remote:
+            server_points = await self._fetch_server_point_count(baseline_id)
+        total = self.total_rows
+        return {
+            'streamed_points': self.stream_progress,
+            'server_points': server_points,
+            'total_points': total,
+            'percent': round(100.0 * self.stream_progress / total, 1) if total else 0.0,
+        }
+
+    def _serialize_batch(self, batch: List[Tuple[str, ...]]) -> bytes:
+        """Render a batch of rows in the configured wire format."""
+        # Ragged rows would otherwise surface as an IndexError deep in a
+        # formatter, mid-stream, after the baseline upload has been paid
+        # for — fail them here with a message that names the problem.
+        expected = len(self._fieldnames_no_index)
+        for row in batch:
+            if len(row) != expected:
+                raise ValueError(
+                    f'Malformed monitor row: {len(row)} cells, expected {expected}'
+                )
+        if self.wire_format == 'arrow':
+            return self._serialize_batch_arrow(batch)
+        return self._serialize_batch_csv(batch)
+
+    def _serialize_batch_arrow(self, batch: List[Tuple[str, ...]]) -> bytes:
+        """Render a batch as an Arrow IPC stream (float64 features).
+
+        Binary float64 cells replace '%g' text, so the server skips CSV
+        reparsing and the wire carries ~half the bytes. Requires a
+        backend that accepts application/vnd.apache.arrow.stream.
+        """
+        flags = self._feature_flags
+        columns = []
+        for i, name in enumerate(self._fieldnames_no_index):
+            values = [row[i] for row in batch]
+            if flags[i]:
+                if np is not None:
+                    arr = pa.array(np.asarray(values, dtype=np.float64))
+                else:
+                    arr = pa.array([float(v) for v in values], type=pa.float64())
+            else:
+                arr = pa.array(values, type=pa.string())
+            columns.append(arr)
+        record = pa.record_batch(columns, names=self._fieldnames_no_index)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, record.schema) as writer:
+            writer.write_batch(record)
+        return sink.getvalue().to_pybytes()
+
+    def _serialize_batch_csv(self, batch: List[Tuple[str, ...]]) -> bytes:
+        """Render a batch of rows as CSV bytes under the cached header."""
+        try:
+            rows = self._rows_numpy(batch) if np is not None else self._rows_scalar(batch)
+        except (ValueError, IndexError):
+            # Junk feature cell — one bulk/batch-level failure routes the
+            # whole batch through the tolerant cold path; the hot
+            # formatters carry no per-cell exception handling.
+            rows = self._rows_tolerant(batch)
+
+        if not self._needs_quoting:
+            payload = self._join_fast(rows)
+            if payload is not None:
+                return payload
+
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return self._header_bytes + buf.getvalue().encode('utf-8')
+
+    def _join_fast(self, rows: List[List[str]]) -> Optional[bytes]:
+        """Serialize quoting-free rows with plain string joins.
+
+        csv.writer runs a per-cell quoting check we can skip: feature
+        cells are freshly '%g'-formatted floats that can never need
+        quoting, so only the handful of metadata cells are scanned here.
+        Returns None (caller falls back to csv.writer) if any metadata
+        cell carries a delimiter after all.
+        """
+        meta_idx = self._meta_idx
+        lines = []
+        for row in rows:
+            for i in meta_idx:
+                value = row[i]
+                if ',' in value or '"' in value or '\n' in value or '\r' in value:
+                    return None
+            lines.append(','.join(row))
+        lines.append('')  # trailing newline, matching csv.writer output
+        return self._header_bytes + '\r\n'.join(lines).encode('utf-8')
+
+    def _rows_scalar(self, batch: List[Tuple[str, ...]]) -> List[List[str]]:
+        """Format rows cell by cell, zipping values against the flag array.
+
+        Features were validated at load time, so the float conversion
+        runs bare — no per-cell try/except frame on the hot path.
+        """
+        flags = self._feature_flags
+        return [
+            ['%g' % float(value) if is_feature else value
+             for value, is_feature in zip(row, flags)]
+            for row in batch
+        ]
+
+    def _rows_tolerant(self, batch: List[Tuple[str, ...]]) -> List[List[str]]:
+        """Cold path for batches that failed the bulk conversion."""
+        flags = self._feature_flags
+        fmt = self._format_feature
+        return [
+            [fmt(value) if is_feature else value
+             for value, is_feature in zip(row, flags)]
+            for row in batch
+        ]
+
+    def _rows_numpy(self, batch: List[Tuple[str, ...]]) -> List[List[str]]:
+        """Format all feature cells of a batch with two vectorized calls.
+
+        One float64 bulk conversion plus one np.char.mod('%g', ...) replaces
+        a Python-level float()+'%g' (and its try/except) per cell; metadata
+        cells pass through untouched.
+        """
+        fidx = self._feature_idx
+        feat = np.array(
+            [[row[i] for i in fidx] for row in batch], dtype=np.float64
+        )
+        feat_str = np.char.mod('%g', feat)
+        flags = self._feature_flags
+        out = []
+        for formatted, row in zip(feat_str, batch):
+            cells = iter(formatted)
+            out.append([
+                next(cells) if is_feature else value
+                for value, is_feature in zip(row, flags)
+            ])
+        return out
+
+    def _format_feature(self, value: str) -> str:
+        """Normalize one feature cell, zeroing junk (cold path only)."""
+        try:
+            return '%g' % float(value)
+        except ValueError:
+            return '0'
+
+    async def _send_monitor_batch(
+        self,
+        baseline_id: int,
+        payload: bytes,
+        filename: str,
+        batch: List[Tuple[str, ...]],
+    ) -> bool:
+        """POST one CSV batch to `/monitor/{id}`, retrying transient failures."""
+        # Pre-flight is opt-in: these rows come from our own loader, whose
+        # schema was validated once at load time — trust our own writer
+        # unless --validate-batches says otherwise.
+        if self.validate_each_batch:
+            if len(batch[0]) != len(self._fieldnames_no_index):
+                raise ValueError(
+                    f'Batch column count {len(batch[0])} != expected '
+                    f'{len(self._fieldnames_no_index)}'
+                )
+
+        request_headers = self.headers
+        if self.compress and len(payload) > 8192:
+            # Float CSVs compress 5-10x even at level 1; worth it off-box.
+            # Tiny batches are skipped — below ~8 KiB the deflate overhead
+            # eats the saving and the body fits one packet anyway.
+            payload = gzip.compress(payload, compresslevel=1)
+            request_headers = {**self.headers, 'Content-Encoding': 'gzip'}
+
+        max_retries = 3
+        for attempt in range(1, max_retries + 1):
+            # Built fresh per attempt (a multipart payload is one-shot once
+            # sent) but on the cached boundary, skipping FormData's
+            # per-request boundary mint and field bookkeeping.
+            data = aiohttp.MultipartWriter('form-data', boundary=self._mp_boundary)
+            part = data.append(payload, {'Content-Type': self._batch_content_type})
+            part.set_content_disposition('form-data', name='file', filename=filename)
+            try:
+                async with self.session.post(
+                    f'{self.api_url}/monitor/{baseline_id}',
+                    data=data,
+                    headers=request_headers,
+                ) as response:
+                    if response.status == 200:
+                        return True
+                    body = await response.text()
+                    logger.warning(
+                        'Batch %s attempt %d failed (%s): %s',
+                        filename, attempt, response.status, body,
+                    )
+                    if response.status < 500:
+                        break  # client error — retrying won't help
+            except aiohttp.ClientError as exc:
+                logger.warning('Batch %s attempt %d errored: %s', filename, attempt, exc)
+            if attempt < max_retries:  # no backoff after the final attempt
+                await asyncio.sleep(attempt)
+
+        if self.debug_dumps:
+            # Keep the failing payload around for postmortem debugging.
+            # Off the event loop, and named uniquely so an error storm
+            # doesn't clobber earlier dumps.
+            debug_dir = Path('temp_streaming')
+            debug_dir.mkdir(exist_ok=True)
+            debug_path = debug_dir / (
+                f'debug_failed_batch_{baseline_id}_{filename.rsplit(".", 1)[0]}'
+                f'_{int(time.time())}.csv'
+            )
+            await asyncio.to_thread(debug_path.write_bytes, payload)
+            logger.error('🧪 Saved failing batch to %s', debug_path)
+        return False
+
+    async def simulate_streaming(
+        self,
+        baseline_id: int,
+        monitor_file_path: str,
+        batch_size: int = 1,
+        delay_seconds: float = 2.0,
+    ) -> bool:
+        """Replay the monitor CSV against the baseline in timed batches."""
+        # The schema scan (sync, CPU/disk) and config update are
+        # independent — run them concurrently. The baseline coordinate
+        # download only feeds a log line, so it joins the gather solely
+        # under --baseline-info; for a large baseline it costs seconds of
+        # startup otherwise.
+        startup = [
+            asyncio.to_thread(self.load_monitor_data, monitor_file_path),
+            self._update_streaming_config(batch_size, delay_seconds),
+        ]
+        if self.fetch_baseline_info:
+            startup.append(self.load_baseline_coordinates(baseline_id))
+        results = await asyncio.gather(*startup)
+        if self.fetch_baseline_info:
+            logger.info('🗺️  Baseline has %d processed points', len(results[-1][0]))
+        else:
+            logger.info('🗺️  Baseline %s ready', baseline_id)
+
+        # Pipeline uploads: pacing happens at dispatch time, while up to
+        # max_inflight POSTs ride the network concurrently. The semaphore
+        # is taken by the producer *before* each task is created, so at
+        # most max_inflight serialized payloads exist at once and the lazy
+        # row iteration keeps memory bounded.
+        sem = asyncio.Semaphore(self.max_inflight)
+        tasks: List[asyncio.Task] = []
+
+        async def _dispatch(payload: bytes, filename: str, batch: List[Tuple[str, ...]]) -> bool:
+            try:
+                return await self._send_monitor_batch(baseline_id, payload, filename, batch)
+            finally:
+                sem.release()
+
+        rows = self.iter_monitor_rows(monitor_file_path)
+
+        if self.adaptive_batch:
+            # Pace per logical point, but coalesce everything that accrues
+            # within max_batch_wait (capped at max_batch_size) into one
+            # wire request, amortizing the fixed per-POST overhead.
+            loop = asyncio.get_running_loop()
+            n = self.total_rows
+            pending: List[Tuple[str, ...]] = []
+            flush_deadline: Optional[float] = None
+            batch_num = 0
+            for idx, row in enumerate(rows):
+                pending.append(row)
+                if flush_deadline is None:
+                    flush_deadline = loop.time() + self.max_batch_wait
+                is_last = idx == n - 1
+                if (
+                    len(pending) >= self.max_batch_size
+                    or loop.time() >= flush_deadline
+                    or is_last
+                ):
+                    batch_num += 1
+                    payload = await asyncio.to_thread(self._serialize_batch, pending)
+                    logger.debug('📤 Sending coalesced batch %d (%d rows)', batch_num, len(pending))
+                    await sem.acquire()
+                    tasks.append(asyncio.create_task(
+                        _dispatch(payload, f'monitor_batch_{batch_num}.{self._batch_suffix}', pending)
+                    ))
+                    self.stream_progress = idx + 1
+                    pending = []
+                    flush_deadline = None
+                    if batch_num % self.log_every == 0:
+                        logger.info(
+                            '📊 %d/%d rows sent (%d coalesced batches)',
+                            idx + 1, n, batch_num,
+                        )
+                if not is_last:
+                    await asyncio.sleep(delay_seconds)
+            if pending:
+                # Safety net: the pre-count can overshoot the iterator
+                # (pandas skips blank lines the counter may have seen), in
+                # which case is_last never fired — flush the remainder
+                # instead of silently dropping it.
+                batch_num += 1
+                payload = await asyncio.to_thread(self._serialize_batch, pending)
+                await sem.acquire()
+                tasks.append(asyncio.create_task(
+                    _dispatch(payload, f'monitor_batch_{batch_num}.{self._batch_suffix}', pending)
+                ))
+                self.stream_progress += len(pending)
+        else:
+            n = self.total_rows
+            total_batches = (n + batch_size - 1) // batch_size
+            batch_num = 0
+            sent_rows = 0
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                batch_num += 1
+
+                # Serialize in a worker thread: encoding batch K+1 then
+                # overlaps the in-flight POST of batch K instead of
+                # stalling it on the event loop.
+                payload = await asyncio.to_thread(self._serialize_batch, batch)
+
+                logger.debug('📤 Sending batch %d/%d (%d rows)', batch_num, total_batches, len(batch))
+                await sem.acquire()
+                tasks.append(asyncio.create_task(
+                    _dispatch(payload, f'monitor_batch_{batch_num}.{self._batch_suffix}', batch)
+                ))
+                sent_rows += len(batch)
+                self.stream_progress = sent_rows
+
+                if batch_num % self.log_every == 0:
+                    status = await self.get_streaming_status(baseline_id)
+                    logger.info(
+                        '📊 Streaming progress: %s%% (%s/%s sent, batch %d/%d)',
+                        status['percent'], status['streamed_points'],
+                        status['total_points'], batch_num, total_batches,
+                    )
+
+                if sent_rows < n:
+                    await asyncio.sleep(delay_seconds)
+
+        results = await asyncio.gather(*tasks)
+        failures = sum(1 for ok in results if not ok)
+        logger.info('🎉 Streaming finished: %d batches failed', failures)
+        return failures == 0
+
+
+async def run(args: argparse.Namespace) -> int:
+    # Resolve the monitor path before any session exists: a blocking
+    # input() inside the async with would stall the loop while pooled
+    # keep-alive connections go stale, and a typo would waste the whole
+    # baseline upload.
+    monitor_file_path = args.monitor
+    if not monitor_file_path:
+        monitor_file_path = input('📂 Monitor CSV path: ').strip()
+    if not os.path.isfile(monitor_file_path):
+        logger.error('Monitor file not found: %s', monitor_file_path)
+        return 1
+
+    async with StreamingSimulator(
+        api_url=args.api_url,
+        email=args.email,
+        password=args.password,
+        org_id=args.org_id,
+        max_inflight=args.max_inflight,
+        debug_dumps=args.debug,
+        strict_validate=args.strict,
+        compress=args.compress,
+        adaptive_batch=args.adaptive_batch,
+        max_batch_wait=args.max_batch_wait,
+        max_batch_size=args.max_batch_size,
+        validate_each_batch=args.validate_batches,
+        wire_format=args.wire_format,
+        feature_max_freq=args.feature_max_freq,
+        feature_max_index=args.feature_max_index,
+        fetch_baseline_info=args.baseline_info,
+        log_every=args.log_every,
+    ) as simulator:
+        await simulator.authenticate()
+
+        baseline_id = await simulator.upload_baseline_file(args.baseline)
+        if baseline_id is None:
+            return 1
+
+        ok = await simulator.simulate_streaming(
+            baseline_id,
+            monitor_file_path,
+            batch_size=args.batch_size,
+            delay_seconds=args.delay,
+        )
+        return 0 if ok else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Simulate sensor streaming against the Dinsight API')
+    parser.add_argument('--api-url', default=DEFAULT_API_URL, help='API base URL')
+    parser.add_argument('--email', default=DEFAULT_EMAIL, help='Login email')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Login password')
+    parser.add_argument('--org-id', type=int, default=None, help='Active organization id (X-Org-ID)')
+    parser.add_argument('--baseline', required=True, help='Baseline CSV to upload')
+    parser.add_argument('--monitor', default=None, help='Monitor CSV to stream (prompted if omitted)')
+    parser.add_argument('--batch-size', type=int, default=1, help='Rows per monitor POST')
+    parser.add_argument('--delay', type=float, default=2.0, help='Seconds between batches')
+    parser.add_argument(
+        '--max-inflight', type=int, default=4,
+        help='Concurrent monitor POSTs (1 = strict serial ordering)',
+    )
+    parser.add_argument(
+        '--debug', action='store_true',
+        help='Save failing batch payloads to temp_streaming/ for postmortem',
+    )
+    parser.add_argument(
+        '--strict', action='store_true',
+        help='Numerically validate every monitor row, not just the first',
+    )
+    parser.add_argument(
+        '--compress', action='store_true',
+        help='gzip monitor batch uploads (backend must accept Content-Encoding)',
+    )
+    parser.add_argument(
+        '--adaptive-batch', action='store_true',
+        help='Coalesce points accumulated during --max-batch-wait into one POST',
+    )
+    parser.add_argument(
+        '--max-batch-wait', type=float, default=1.0,
+        help='Adaptive mode: max seconds to hold points before flushing',
+    )
+    parser.add_argument(
+        '--max-batch-size', type=int, default=32,
+        help='Adaptive mode: max points per coalesced POST',
+    )
+    parser.add_argument(
+        '--validate-batches', action='store_true',
+        help='Re-check each outgoing batch against the schema before POSTing',
+    )
+    parser.add_argument(
+        '--wire-format', choices=('csv', 'arrow'), default='csv',
+        help='Batch upload encoding (arrow needs pyarrow and backend support)',
+    )
+    parser.add_argument(
+        '--feature-max-freq', type=float, default=None,
+        help='Drop freq_* columns above this frequency at load time',
+    )
+    parser.add_argument(
+        '--feature-max-index', type=int, default=None,
+        help='Drop f_* columns above this index at load time',
+    )
+    parser.add_argument(
+        '--baseline-info', action='store_true',
+        help='Download baseline coordinates at startup to log the point count',
+    )
+    parser.add_argument(
+        '--log-every', type=int, default=50,
+        help='Emit an INFO progress line every N batches',
+    )
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())